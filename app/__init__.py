@@ -1,6 +1,7 @@
 from .document_processor import DocumentProcessor
 from .pdf_handler import FitzPDFHandler
 from .retriever import DocumentRetriever
+from .vector_cache import VectorL1Cache
 from .chatbot import ConstructionChatbot
 
 __version__ = "1.0.0"  # First production-ready version
\ No newline at end of file
@@ -1,6 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List
+import asyncio
 import logging
+import multiprocessing
+import os
 from datetime import datetime
 
 from .document_processor import DocumentProcessor
@@ -10,8 +14,17 @@ logger = logging.getLogger(__name__)
 
 class ConstructionChatbot:
     def __init__(self):
+        # PDF extraction and section splitting run here, off the event loop
+        # and the GIL. Workers only start on the first upload, from a worker
+        # thread, so they come from a forkserver rather than forking this
+        # multi-threaded process
+        self.pdf_executor = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+        
         # Initialize our document processor and retriever
-        self.processor = DocumentProcessor()
+        self.processor = DocumentProcessor(executor=self.pdf_executor)
         self.retriever = DocumentRetriever()
         
         # Keep last 5 exchanges for context
@@ -23,16 +36,19 @@ class ConstructionChatbot:
             # Create an ID with date for better tracking
             doc_id = f"doc_{file_path.stem}_{datetime.now().strftime('%Y%m%d')}"
             
-            # Process the document
-            processed = self.processor.process_document(str(file_path), doc_id)
+            # Process the document - the thread just waits on the pdf pool,
+            # so /chat keeps being served while large uploads are split
+            processed = await asyncio.get_running_loop().run_in_executor(
+                None, self.processor.process_document, str(file_path), doc_id
+            )
             
             # Store sections in vector DB
-            await self.retriever.add_sections(doc_id, processed["sections"])
+            await self.retriever.add_sections(doc_id, processed)
             
             return {
                 "status": "success",
                 "doc_id": doc_id,
-                "sections_processed": len(processed["sections"])
+                "sections_processed": len(processed["titles"])
             }
             
         except Exception as e:
@@ -78,4 +94,6 @@ class ConstructionChatbot:
     
     async def close(self):
         """Clean up resources"""
-        await self.retriever.close()
\ No newline at end of file
+        await self.retriever.close()
+        # Waiting on worker processes blocks, so keep it off the event loop
+        await asyncio.to_thread(self.pdf_executor.shutdown)
\ No newline at end of file
@@ -9,11 +9,40 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379"
     VECTOR_DB_PATH: str = "db/vector_store"
     
+    # Requests wait up to REDIS_POOL_TIMEOUT seconds for a free connection
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: int = 20
+    
     # I found these values work well for most construction docs
     # Adjust if you're processing a lot more documents
     BATCH_SIZE: int = 10
+    
+    # Processed documents kept in memory for search, by total text size
+    DOC_CACHE_BYTES: int = 256 * 1024 * 1024
     MAX_CONCURRENT_CALLS: int = 5
     
+    # Partial batches get flushed after this many seconds; failed flushes
+    # retry with doubling delays up to the max
+    BATCH_FLUSH_SECONDS: float = 5.0
+    BATCH_FLUSH_MAX_SECONDS: float = 300.0
+    
+    # Chat queries arriving within this window share one vector search
+    QUERY_BATCH_SECONDS: float = 0.01
+    
+    # Embeddings - OpenAI accepts many inputs per request, 256 keeps payloads sane.
+    # 512 dims keeps retrieval quality close to the full 1536 at a third of the size
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS: int = 512
+    EMBEDDING_CHUNK_SIZE: int = 256
+    
+    # Cached answers live this long, and paraphrased questions reuse an
+    # answer when their embeddings are at least this similar
+    CACHE_TTL_SECONDS: int = 300
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    
+    # In-process cache in front of the query cache collection, per worker
+    L1_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    
     class Config:
         env_file = ".env"
 
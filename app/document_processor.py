@@ -1,114 +1,237 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
+from statistics import median
+from cachetools import LRUCache
+import numpy as np
+from app.config import get_settings
 from app.pdf_handler import FitzPDFHandler  
+import multiprocessing
+import os
 import re
+import threading
+
+# Pages handed to each worker at once - keeps dispatch overhead low
+PAGE_BLOCK_SIZE = 10
+
+# PyMuPDF span flag for bold text
+BOLD_FLAG = 16
+
+# Points above the page's median font size before a line counts as a header
+HEADER_SIZE_MARGIN = 0.5
+
+# Section header patterns, fused into one regex so each line is matched once
+_HEADER_RE = re.compile("|".join(f"(?:{pattern})" for pattern in [
+    r'^\d+\.\d+\s+[A-Z]',  # Matches patterns like "1.1 GENERAL"
+    r'^SECTION\s+\d{2}',    # Matches "SECTION 01"
+    r'^Article\s+\d+',      # Matches "Article 1"
+    r'^\d+\.\s+[A-Z]',      # Matches "1. SCOPE"
+]))
+
+
+def _process_page_block(file_path: str, start_page: int, end_page: int) -> Tuple[List[str], List[str], List[int]]:
+    """Split a range of pages into section columns (titles, contents, pages) in a worker process"""
+    titles = []
+    contents = []
+    pages = []
+    
+    # Each worker opens its own fitz document - they can't be shared across processes
+    with FitzPDFHandler(file_path) as pdf_handler:
+        for page_num in range(start_page, end_page + 1):
+            blocks = pdf_handler.get_page_blocks(page_num)
+            
+            # Split into sections based on headers
+            page_titles, page_contents = DocumentProcessor._split_into_sections(blocks, page_num)
+            titles.extend(page_titles)
+            contents.extend(page_contents)
+            pages.extend([page_num] * len(page_titles))
+    
+    return titles, contents, pages
+
+
+def _document_size(document: Dict) -> int:
+    """Approximate memory held by a processed document's text"""
+    return (
+        sum(map(len, document['titles'])) + sum(map(len, document['contents'])) +
+        sum(map(len, document['titles_lc'])) + sum(map(len, document['contents_lc'])) +
+        document['pages'].nbytes
+    )
+
 
 class DocumentProcessor:
-    def __init__(self):
-        self.documents = {}
+    def __init__(self, executor: Optional[Executor] = None):
+        # Shared process pool for page work - without one, large documents
+        # get a pool of their own and small ones run inline
+        self.executor = executor
+        
+        # Least recently used documents are dropped once the text size cap is hit
+        self.documents = LRUCache(
+            maxsize=get_settings().DOC_CACHE_BYTES,
+            getsizeof=_document_size
+        )
+        
+        # LRUCache isn't thread-safe, and uploads store documents from worker threads
+        self._documents_lock = threading.Lock()
 
     def process_document(self, file_path: str, doc_id: str) -> Dict:
         """Process a construction document and extract its contents"""
         try:
-            # Initialize the PDF handler
-            pdf_handler = FitzPDFHandler(file_path)
+            with FitzPDFHandler(file_path) as pdf_handler:
+                total_pages = pdf_handler.number_of_pages
             
-            # Extract document sections
-            sections = []
+            # Sections are stored as parallel columns rather than one dict each
+            titles = []
+            contents = []
+            pages = []
             
-            # Process each page
-            for page_num in range(1, pdf_handler.number_of_pages + 1):
-                text = pdf_handler.get_page_text(page_num)
-                
-                # Split into sections based on headers
-                page_sections = self._split_into_sections(text, page_num)
-                sections.extend(page_sections)
+            # Page blocks come back in page order
+            for block_titles, block_contents, block_pages in self._process_pages(file_path, total_pages):
+                titles.extend(block_titles)
+                contents.extend(block_contents)
+                pages.extend(block_pages)
             
-            # Store processed document
-            self.documents[doc_id] = {
-                'sections': sections,
-                'total_pages': pdf_handler.number_of_pages
+            # Store processed document - lowercased once here so searches
+            # don't redo it on every call
+            document = {
+                'titles': titles,
+                'contents': contents,
+                'pages': np.array(pages, dtype=np.int32),
+                'titles_lc': [title.lower() for title in titles],
+                'contents_lc': [content.lower() for content in contents],
+                'total_pages': total_pages
             }
+            try:
+                with self._documents_lock:
+                    self.documents[doc_id] = document
+            except ValueError:
+                # Bigger than the whole cache - still returned, just not searchable
+                pass
             
-            # Clean up
-            pdf_handler.close()
-            
-            return self.documents[doc_id]
+            return document
             
         except Exception as e:
             raise Exception(f"Error processing document {doc_id}: {str(e)}")
     
-    def _split_into_sections(self, text: str, page_num: int) -> List[Dict]:
-        """Split text into logical sections"""
-        sections = []
-        current_section = {
-            'title': '',
-            'content': '',
-            'page': page_num
-        }
+    def _process_pages(self, file_path: str, total_pages: int) -> List[Tuple[List[str], List[str], List[int]]]:
+        """Split pages into sections, spreading blocks of pages across processes"""
+        start_pages = range(1, total_pages + 1, PAGE_BLOCK_SIZE)
+        end_pages = [min(start + PAGE_BLOCK_SIZE - 1, total_pages) for start in start_pages]
+        
+        # map() keeps block order, so pages come back in natural order
+        if self.executor is not None:
+            return list(self.executor.map(_process_page_block, repeat(file_path), start_pages, end_pages))
         
-        # Split text into lines
-        lines = text.split('\n')
+        # Small docs aren't worth the process startup cost
+        if total_pages <= PAGE_BLOCK_SIZE:
+            return [_process_page_block(file_path, 1, total_pages)]
+        
+        workers = min(os.cpu_count() or 1, len(start_pages))
+        # Callers may be threaded, so don't fork this process directly
+        mp_context = multiprocessing.get_context("forkserver")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            return list(executor.map(_process_page_block, repeat(file_path), start_pages, end_pages))
+    
+    @staticmethod
+    def _split_into_sections(blocks: List[Dict], page_num: int) -> Tuple[List[str], List[str]]:
+        """Split a page's text blocks into logical sections, as (titles, contents)"""
+        titles = []
+        contents = []
+        current_title = ''
+        current_lines = []
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        # Body text sets the baseline - headers are set larger than it
+        sizes = [
+            span['size']
+            for block in blocks
+            for line in block.get('lines', [])
+            for span in line['spans']
+            if span['text'].strip()
+        ]
+        header_size = median(sizes) + HEADER_SIZE_MARGIN if sizes else 0
+        
+        for block in blocks:
+            for block_line in block.get('lines', []):
+                spans = [span for span in block_line['spans'] if span['text'].strip()]
+                if not spans:
+                    continue
+                
+                line = ''.join(span['text'] for span in block_line['spans']).strip()
                 
-            # Check if line is a header
-            if self._is_section_header(line):
-                # Save previous section if it exists
-                if current_section['content']:
-                    sections.append(current_section)
-                    
-                # Start new section
-                current_section = {
-                    'title': line,
-                    'content': '',
-                    'page': page_num
-                }
-            else:
-                current_section['content'] += line + '\n'
+                # Styled lines (all bold or larger than body) are headers,
+                # numbered plain-text headers still fall back to the regex
+                styled = (all(span['flags'] & BOLD_FLAG for span in spans) or
+                          max(span['size'] for span in spans) > header_size)
+                
+                # Check if line is a header
+                if styled or DocumentProcessor._is_section_header(line):
+                    # Save previous section if it exists
+                    if current_lines:
+                        titles.append(current_title)
+                        contents.append('\n'.join(current_lines) + '\n')
+                        
+                    # Start new section
+                    current_title = line
+                    current_lines = []
+                else:
+                    current_lines.append(line)
         
         # Add final section
-        if current_section['content']:
-            sections.append(current_section)
+        if current_lines:
+            titles.append(current_title)
+            contents.append('\n'.join(current_lines) + '\n')
         
-        return sections
+        return titles, contents
     
-    def _is_section_header(self, line: str) -> bool:
+    @staticmethod
+    def _is_section_header(line: str) -> bool:
         """Check if line is likely a section header"""
-        header_patterns = [
-            r'^\d+\.\d+\s+[A-Z]',  # Matches patterns like "1.1 GENERAL"
-            r'^SECTION\s+\d{2}',    # Matches "SECTION 01"
-            r'^Article\s+\d+',      # Matches "Article 1"
-            r'^\d+\.\s+[A-Z]',      # Matches "1. SCOPE"
-        ]
-        
-        return any(re.match(pattern, line) for pattern in header_patterns)
+        return _HEADER_RE.match(line) is not None
 
     def search_documents(self, query: str, max_results: int = 5) -> List[Dict]:
         """Search through processed documents for relevant sections"""
-        results = []
+        # Reads reorder the LRU too, so snapshot under the lock
+        with self._documents_lock:
+            docs = list(self.documents.items())
+        if not docs or max_results <= 0:
+            return []
         
         # Convert query to lowercase for case-insensitive matching
         query = query.lower()
         
-        # Search through all documents
-        for doc_id, doc in self.documents.items():
-            for section in doc['sections']:
-                if (query in section['title'].lower() or 
-                    query in section['content'].lower()):
-                    results.append({
-                        'doc_id': doc_id,
-                        'title': section['title'],
-                        'content': section['content'],
-                        'page': section['page']
-                    })
+        # One score per section across all documents - count() doubles as the match check
+        scores = np.fromiter(
+            (
+                title_lc.count(query) + content_lc.count(query)
+                for _, doc in docs
+                for title_lc, content_lc in zip(doc['titles_lc'], doc['contents_lc'])
+            ),
+            dtype=np.int64
+        )
+        matched = np.flatnonzero(scores)
+        if not matched.size:
+            return []
         
-        # Sort by relevance (simple contains check)
-        results.sort(key=lambda x: 
-            x['title'].lower().count(query) + 
-            x['content'].lower().count(query), 
-            reverse=True)
+        # Rank by score, earlier sections first on ties. Keys are unique,
+        # so the O(N) partition picks exactly what a full sort would
+        keys = scores[matched] * len(scores) - matched
+        k = min(max_results, matched.size)
+        top = np.argpartition(-keys, k - 1)[:k]
+        top = matched[top[np.argsort(-keys[top])]]
+        
+        # Map flat positions back to (document, section)
+        ends = np.cumsum([len(doc['titles']) for _, doc in docs])
+        doc_indexes = np.searchsorted(ends, top, side='right')
+        
+        # Only the top hits get built into dicts
+        results = []
+        for position, doc_index in zip(top.tolist(), doc_indexes.tolist()):
+            doc_id, doc = docs[doc_index]
+            idx = position - (int(ends[doc_index - 1]) if doc_index else 0)
+            results.append({
+                'doc_id': doc_id,
+                'title': doc['titles'][idx],
+                'content': doc['contents'][idx],
+                'page': int(doc['pages'][idx])
+            })
         
-        return results[:max_results]
\ No newline at end of file
+        return results
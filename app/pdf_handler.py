@@ -1,18 +1,54 @@
 from typing import Union, List, Dict
 import fitz
+from cachetools import LRUCache
 from pathlib import Path
 import re
 from datetime import datetime
 
+# Pages of extracted text kept per open document - enough for metadata,
+# TOC and section lookups without holding a whole large spec in memory
+PAGE_CACHE_SIZE = 128
+
+# Patterns are checked in order, so earlier ones take priority
+_DATE_RES = [re.compile(pattern) for pattern in [
+    r'Date:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    r'Issued:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    r'Rev\s*Date:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\s*(?:Rev|Issue|Date)',
+    r'Effective\s*Date:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})'
+]]
+
+_PROJECT_RES = [re.compile(pattern) for pattern in [
+    r'Project\s*(?:No|Number|#)[:.]?\s*([A-Za-z0-9-]+)',
+    r'Project\s*ID[:.]?\s*([A-Za-z0-9-]+)',
+    r'Contract\s*(?:No|Number|#)[:.]?\s*([A-Za-z0-9-]+)',
+    r'Job\s*(?:No|Number|#)[:.]?\s*([A-Za-z0-9-]+)'
+]]
+
+_REVISION_RES = [re.compile(pattern) for pattern in [
+    r'Rev(?:ision)?\s*(?:No|Number|#)?[:.]?\s*([A-Za-z0-9-]+)',
+    r'Version\s*[:.]?\s*([A-Za-z0-9-]+)',
+    r'Update\s*[:.]?\s*([A-Za-z0-9-]+)',
+    r'(?:Rev|Revision)\s*([A-Za-z0-9-]+)'
+]]
+
+# Fallback TOC patterns when the PDF has no built-in outline
+_TOC_RES = [re.compile(pattern, re.MULTILINE) for pattern in [
+    r'^(?:Section|SECTION)\s+(\d+\.?\d*)\s+([^\n]+)',
+    r'^(\d+\.?\d*)\s+([A-Z][^\n]+)',
+    r'^(?:ARTICLE|Article)\s+(\d+)\s+([^\n]+)'
+]]
+
 class FitzPDFHandler:  
     """Handles PDF documents for construction document chatbot."""
 
-    def __init__(self, input_source: Union[Path, str, bytes]):
+    def __init__(self, input_source: Union[Path, str, bytes], page_cache_size: int = PAGE_CACHE_SIZE):
         """
         Initialize PDF handler with multiple input source types.
         
         Args:
             input_source: Can be a Path object, string path, or bytes of PDF content
+            page_cache_size: Number of pages of extracted text to keep cached
         """
         if isinstance(input_source, Path):
             self.document = self._load_from_path(input_source)
@@ -23,6 +59,9 @@ class FitzPDFHandler:
         else:
             raise ValueError("Input source must be a Path, string path, or bytes.")
 
+        # Per-document cache so repeat reads of a page skip re-extraction
+        self._page_cache = LRUCache(maxsize=page_cache_size)
+
     def _load_from_path(self, input_source: Path) -> fitz.Document:
         """Load PDF from file path."""
         try:
@@ -51,19 +90,46 @@ class FitzPDFHandler:
         Returns:
             str: Text content of the page
         """
+        if page_number in self._page_cache:
+            return self._page_cache[page_number]
+
         try:
-            return self.document[page_number - 1].get_text()
+            text = self.document[page_number - 1].get_text()
         except IndexError:
             raise ValueError(f"Page number {page_number} out of range")
         except Exception as e:
             raise Exception(f"Error extracting text from page {page_number}: {str(e)}")
 
+        self._page_cache[page_number] = text
+        return text
+
+    def get_page_blocks(self, page_number: int) -> List[Dict]:
+        """
+        Extract structured text blocks (lines, spans, font info) from a page.
+
+        Args:
+            page_number (int): Page number (1-based indexing)
+        Returns:
+            List[Dict]: PyMuPDF text blocks, images excluded
+        """
+        try:
+            page = self.document[page_number - 1]
+            return page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+        except IndexError:
+            raise ValueError(f"Page number {page_number} out of range")
+        except Exception as e:
+            raise Exception(f"Error extracting blocks from page {page_number}: {str(e)}")
+
     def get_document_text(self) -> str:
         """Extract text from entire document."""
         try:
+            # Iterate pages directly instead of going through the 1-based
+            # get_page_text wrapper. Cached pages are reused, but a full pass
+            # doesn't fill the cache - it would just churn it
+            cache = self._page_cache
             return "\n".join(
-                self.get_page_text(page_num)
-                for page_num in range(1, self.number_of_pages + 1)
+                cache[page.number + 1] if page.number + 1 in cache else page.get_text()
+                for page in self.document
             )
         except Exception as e:
             raise Exception(f"Error extracting document text: {str(e)}")
@@ -124,46 +190,24 @@ class FitzPDFHandler:
 
     def _extract_date(self, text: str) -> str:
         """Extract date from document text."""
-        date_patterns = [
-            r'Date:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            r'Issued:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            r'Rev\s*Date:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})\s*(?:Rev|Issue|Date)',
-            r'Effective\s*Date:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})'
-        ]
-
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
+        for pattern in _DATE_RES:
+            match = pattern.search(text)
             if match:
                 return match.group(1)
         return ''
 
     def _extract_project_number(self, text: str) -> str:
         """Extract project number if present."""
-        project_patterns = [
-            r'Project\s*(?:No|Number|#)[:.]?\s*([A-Za-z0-9-]+)',
-            r'Project\s*ID[:.]?\s*([A-Za-z0-9-]+)',
-            r'Contract\s*(?:No|Number|#)[:.]?\s*([A-Za-z0-9-]+)',
-            r'Job\s*(?:No|Number|#)[:.]?\s*([A-Za-z0-9-]+)'
-        ]
-
-        for pattern in project_patterns:
-            match = re.search(pattern, text)
+        for pattern in _PROJECT_RES:
+            match = pattern.search(text)
             if match:
                 return match.group(1)
         return ''
 
     def _extract_revision_number(self, text: str) -> str:
         """Extract revision number if present."""
-        revision_patterns = [
-            r'Rev(?:ision)?\s*(?:No|Number|#)?[:.]?\s*([A-Za-z0-9-]+)',
-            r'Version\s*[:.]?\s*([A-Za-z0-9-]+)',
-            r'Update\s*[:.]?\s*([A-Za-z0-9-]+)',
-            r'(?:Rev|Revision)\s*([A-Za-z0-9-]+)'
-        ]
-
-        for pattern in revision_patterns:
-            match = re.search(pattern, text)
+        for pattern in _REVISION_RES:
+            match = pattern.search(text)
             if match:
                 return match.group(1)
         return ''
@@ -184,14 +228,8 @@ class FitzPDFHandler:
             first_pages_text = self.extract_section_text(1, min(5, self.number_of_pages))
             
             # Look for common section patterns
-            section_patterns = [
-                r'^(?:Section|SECTION)\s+(\d+\.?\d*)\s+([^\n]+)',
-                r'^(\d+\.?\d*)\s+([A-Z][^\n]+)',
-                r'^(?:ARTICLE|Article)\s+(\d+)\s+([^\n]+)'
-            ]
-            
-            for pattern in section_patterns:
-                matches = re.finditer(pattern, first_pages_text, re.MULTILINE)
+            for pattern in _TOC_RES:
+                matches = pattern.finditer(first_pages_text)
                 for match in matches:
                     toc.append({
                         'title': f"{match.group(1)} {match.group(2).strip()}",
@@ -206,6 +244,7 @@ class FitzPDFHandler:
 
     def close(self):
         """Close the PDF document."""
+        self._page_cache.clear()
         try:
             self.document.close()
         except Exception as e:
@@ -3,33 +3,66 @@ import chromadb
 import openai
 import redis.asyncio as redis
 import logging
-import json
-from typing import List, Dict, Optional
+import orjson
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+import time
 import uuid
 
 from .config import get_settings
+from .vector_cache import VectorL1Cache
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
 class DocumentRetriever:
     def __init__(self):
-        # Initialize vector store for document sections
+        # Initialize vector store for document sections. OpenAI embeddings
+        # are unit length, so inner product ranks the same as cosine
         self.vector_store = chromadb.Client()
-        self.collection = self.vector_store.create_collection("construction_docs")
+        self.collection = self.vector_store.create_collection(
+            "construction_docs",
+            metadata={"hnsw:space": "ip"}
+        )
         
-        # Redis for caching frequent queries
-        self.redis = redis.from_url(settings.REDIS_URL)
+        # Past questions keyed by embedding, so paraphrases hit the cache
+        self.query_cache = self.vector_store.create_collection(
+            "query_cache",
+            metadata={"hnsw:space": "cosine"}
+        )
+        
+        # Hot questions are answered from memory before touching Chroma
+        self.l1_cache = VectorL1Cache(
+            max_bytes=settings.L1_CACHE_MAX_BYTES,
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=settings.CACHE_TTL_SECONDS
+        )
+        
+        # Redis for caching frequent queries - bounded pool so load spikes
+        # wait for a connection instead of opening new ones
+        self.redis_pool = redis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT
+        )
+        self.redis = redis.Redis(connection_pool=self.redis_pool)
         
         # Rate limiting - I hit OpenAI's rate limits at >5 concurrent
         self.semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_CALLS)
         
-        # Batch processing queue
+        # openai 1.x client for embeddings
+        self.openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        
+        # Batch processing queue - flushed when full or by a timer
         self.batch_queue = []
-        self.last_process_time = datetime.now()
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # Pending vector searches, answered together by one Chroma query
+        self._search_queue: List[Tuple[List[float], asyncio.Future]] = []
+        self._search_task: Optional[asyncio.Task] = None
     
-    async def add_sections(self, doc_id: str, sections: List[Dict]):
+    async def add_sections(self, doc_id: str, sections: Dict):
+        """Queue a processed document's section columns (titles, contents, pages)"""
         # Add unique identifier to prevent overwrites
         unique_doc_id = f"{doc_id}_{uuid.uuid4().hex[:8]}"
         
@@ -39,58 +72,111 @@ class DocumentRetriever:
             "timestamp": datetime.now()
         })
         
-        # Process batch if full or if it's been waiting too long
-        if (len(self.batch_queue) >= settings.BATCH_SIZE or 
-            (datetime.now() - self.last_process_time).seconds > 60):
+        # Process batch if full, otherwise make sure a flush is scheduled
+        if len(self.batch_queue) >= settings.BATCH_SIZE:
             await self._process_batch()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self, delay: float = settings.BATCH_FLUSH_SECONDS):
+        """Flush a partial batch so small uploads don't sit in the queue"""
+        await asyncio.sleep(delay)
+        try:
+            await self._process_batch()
+        except Exception:
+            # Already logged and re-queued - retry with backoff rather than
+            # waiting for another upload to schedule a flush
+            if self.batch_queue:
+                retry_delay = min(delay * 2, settings.BATCH_FLUSH_MAX_SECONDS)
+                self._flush_task = asyncio.create_task(self._flush_later(retry_delay))
     
     async def _process_batch(self):
         if not self.batch_queue:
             return
+        
+        # Take ownership of the queue so concurrent adds start a fresh batch
+        batch, self.batch_queue = self.batch_queue, []
             
         try:
             docs = []
             metadata = []
             ids = []
             
-            for item in self.batch_queue:
-                for idx, section in enumerate(item["sections"]):
-                    docs.append(section["content"])
+            # Every section in the batch shares one processed_at stamp
+            processed_at = datetime.now().isoformat()
+            
+            for item in batch:
+                sections = item["sections"]
+                docs.extend(sections["contents"])
+                # tolist() turns the int32 page column into plain ints in one go
+                for idx, (title, page) in enumerate(zip(sections["titles"], sections["pages"].tolist())):
                     metadata.append({
                         "doc_id": item["doc_id"],
-                        "title": section["title"],
-                        "page": section["page"],
-                        "processed_at": datetime.now().isoformat()
+                        "title": title,
+                        "page": page,
+                        "processed_at": processed_at
                     })
                     ids.append(f"{item['doc_id']}_section_{idx}")
             
+            if not docs:
+                return
+            
+            # Embed up front so Chroma skips its own single-threaded embedder
+            embeddings = await self._embed(docs)
+            
             # Add to vector store
             self.collection.add(
                 documents=docs,
+                embeddings=embeddings,
                 metadatas=metadata,
                 ids=ids
             )
             
-            self.last_process_time = datetime.now()
-            self.batch_queue = []
-            
         except Exception as e:
             logger.error(f"Failed to process batch: {e}")
+            self.batch_queue = batch + self.batch_queue
             raise
     
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with OpenAI, sending chunks concurrently"""
+        size = settings.EMBEDDING_CHUNK_SIZE
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        
+        results = await asyncio.gather(*(self._embed_chunk(chunk) for chunk in chunks))
+        return [embedding for chunk in results for embedding in chunk]
+    
+    async def _embed_chunk(self, texts: List[str]) -> List[List[float]]:
+        # Shares the rate limit with chat completions
+        async with self.semaphore:
+            response = await self.openai_client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=texts,
+                dimensions=settings.EMBEDDING_DIMENSIONS
+            )
+        
+        data = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in data]
+    
     async def query(self, question: str, context: Optional[str] = None) -> Dict:
         cache_key = f"query:{question}"
         
         try:
             # Check cache first
             if cached := await self.redis.get(cache_key):
-                return json.loads(cached)
+                return orjson.loads(cached)
             
-            # Search vector store
-            results = self.collection.query(
-                query_texts=[question],
-                n_results=3  # Found that 3 gives good context without noise
-            )
+            # Embed with the same model as the sections
+            query_embedding = (await self._embed([question]))[0]
+            
+            # Then check for a cached answer to a similar question
+            if cached := self.l1_cache.get(query_embedding):
+                return cached
+            if cached := self._semantic_cache_get(query_embedding):
+                self.l1_cache.set(query_embedding, cached)
+                return cached
+            
+            # Search vector store, batched with any concurrent queries
+            results = await self._search(query_embedding)
             
             if not results["documents"] or not results["documents"][0]:
                 return {
@@ -102,12 +188,15 @@ class DocumentRetriever:
             async with self.semaphore:
                 response = await self._generate_response(question, results, context)
             
-            # Cache for 5 minutes
+            # Cache for 5 minutes - serialized once, orjson gives bytes Redis takes as-is
+            payload = orjson.dumps(response)
             await self.redis.set(
                 cache_key,
-                json.dumps(response),
-                ex=300
+                payload,
+                ex=settings.CACHE_TTL_SECONDS
             )
+            self._semantic_cache_set(question, query_embedding, payload.decode())
+            self.l1_cache.set(query_embedding, response)
             
             return response
             
@@ -115,6 +204,73 @@ class DocumentRetriever:
             logger.error(f"Query failed: {e}")
             raise
     
+    async def _search(self, embedding: List[float]) -> Dict:
+        """Queue a vector search and wait for its slice of the batched result"""
+        future = asyncio.get_running_loop().create_future()
+        self._search_queue.append((embedding, future))
+        
+        # First query in an empty queue opens the batching window
+        if len(self._search_queue) == 1:
+            self._search_task = asyncio.create_task(self._flush_searches())
+        
+        return await future
+    
+    async def _flush_searches(self):
+        await asyncio.sleep(settings.QUERY_BATCH_SECONDS)
+        batch, self._search_queue = self._search_queue, []
+        
+        try:
+            results = self.collection.query(
+                query_embeddings=[embedding for embedding, _ in batch],
+                n_results=3  # Found that 3 gives good context without noise
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        # Hand each caller a single-query result in the usual shape
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result({
+                    key: [value[i]] if value is not None else None
+                    for key, value in results.items()
+                })
+    
+    def _semantic_cache_get(self, embedding: List[float]) -> Optional[Dict]:
+        """Return the cached answer for the closest fresh question, if close enough"""
+        if not self.query_cache.count():
+            return None
+        
+        hits = self.query_cache.query(
+            query_embeddings=[embedding],
+            n_results=1,
+            where={"cached_at": {"$gte": time.time() - settings.CACHE_TTL_SECONDS}}
+        )
+        if not hits["ids"] or not hits["ids"][0]:
+            return None
+        
+        # Cosine distance is 1 - similarity
+        if 1 - hits["distances"][0][0] < settings.SEMANTIC_CACHE_THRESHOLD:
+            return None
+        
+        return orjson.loads(hits["metadatas"][0][0]["response"])
+    
+    def _semantic_cache_set(self, question: str, embedding: List[float], payload: str):
+        """Store a serialized response under the question's embedding"""
+        now = time.time()
+        
+        # Drop expired entries so the cache doesn't grow forever
+        self.query_cache.delete(where={"cached_at": {"$lt": now - settings.CACHE_TTL_SECONDS}})
+        
+        self.query_cache.add(
+            ids=[uuid.uuid4().hex],
+            embeddings=[embedding],
+            documents=[question],
+            metadatas=[{"response": payload, "cached_at": now}]
+        )
+    
     async def _generate_response(
         self,
         question: str,
@@ -154,11 +310,13 @@ class DocumentRetriever:
         if context:
             parts.append(context)
         
-        if results["documents"] and results["documents"][0]:
+        docs = results["documents"][0] if results["documents"] else None
+        if docs:
+            metas = results["metadatas"][0]
             parts.append("Relevant sections:")
-            for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-                parts.append(f"\nSection: {meta['title']} (Page {meta['page']})")
-                parts.append(f"Content: {doc}")
+            # One string per section rather than separate header/content parts
+            for doc, meta in zip(docs, metas):
+                parts.append(f"\nSection: {meta['title']} (Page {meta['page']})\nContent: {doc}")
         else:
             parts.append("No relevant sections found.")
         
@@ -168,9 +326,12 @@ class DocumentRetriever:
     async def close(self):
         try:
             # Clean up any remaining docs
+            if self._flush_task and not self._flush_task.done():
+                self._flush_task.cancel()
             if self.batch_queue:
                 await self._process_batch()
             await self.redis.close()
+            await self.redis_pool.disconnect()
         except Exception as e:
             logger.error(f"Cleanup failed: {e}")
             raise
@@ -0,0 +1,141 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+import time
+
+import numpy as np
+import orjson
+
+class VectorL1Cache:
+    """In-process LRU cache of responses keyed by query embedding.
+
+    Random-projection LSH narrows each lookup to a handful of candidates,
+    which are then checked with cosine similarity. Cached vectors are kept
+    as int8 with a per-vector scale, a quarter of the float32 footprint.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        threshold: float,
+        ttl_seconds: int,
+        num_tables: int = 8,
+        num_bits: int = 12,
+        seed: int = 0
+    ):
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+
+        # Hyperplanes are drawn on first use, once we know the embedding size
+        self._rng = np.random.default_rng(seed)
+        self._planes: Optional[np.ndarray] = None
+        self._powers = 1 << np.arange(num_bits, dtype=np.int64)
+
+        # One bucket dict per table: hash -> entry ids
+        self._buckets = [defaultdict(set) for _ in range(num_tables)]
+
+        # entry id -> (codes, scale, response, bucket keys, size, cached_at), oldest first
+        self._entries: OrderedDict = OrderedDict()
+        self._next_id = 0
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, embedding: List[float]) -> Optional[Dict]:
+        """Return the cached response for the most similar fresh query, if any"""
+        if not self._entries:
+            return None
+
+        vector = self._normalize(embedding)
+        keys = self._hash(vector)
+
+        candidates = set()
+        for table, key in zip(self._buckets, keys):
+            candidates.update(table.get(key, ()))
+        if not candidates:
+            return None
+
+        # Drop expired candidates first so a stale best match can't hide a fresh one
+        now = time.time()
+        ids = []
+        for entry_id in candidates:
+            if now - self._entries[entry_id][5] > self.ttl_seconds:
+                self._evict(entry_id)
+            else:
+                ids.append(entry_id)
+        if not ids:
+            return None
+
+        # Check the few candidates with one matmul, rescaling the int8 codes
+        entries = [self._entries[entry_id] for entry_id in ids]
+        codes = np.stack([entry[0] for entry in entries])
+        scales = np.array([entry[1] for entry in entries], dtype=np.float32)
+        similarities = (codes @ vector) * scales
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        entry_id = ids[best]
+        self._entries.move_to_end(entry_id)
+        return entries[best][2]
+
+    def set(self, embedding: List[float], response: Dict):
+        """Cache a response, evicting least recently used entries past max_bytes"""
+        vector = self._normalize(embedding)
+        keys = self._hash(vector)
+        codes, scale = self._quantize(vector)
+        size = codes.nbytes + len(orjson.dumps(response))
+        if size > self.max_bytes:
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self._entries[entry_id] = (codes, scale, response, keys, size, time.time())
+        for table, key in zip(self._buckets, keys):
+            table[key].add(entry_id)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def clear(self):
+        for table in self._buckets:
+            table.clear()
+        self._entries.clear()
+        self._bytes = 0
+
+    def _evict(self, entry_id: int):
+        _, _, _, keys, size, _ = self._entries.pop(entry_id)
+        for table, key in zip(self._buckets, keys):
+            bucket = table[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del table[key]
+        self._bytes -= size
+
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _quantize(self, vector: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Symmetric int8 quantization - vector is roughly codes * scale"""
+        peak = float(np.abs(vector).max())
+        if not peak:
+            return np.zeros(vector.shape, dtype=np.int8), 0.0
+        scale = peak / 127
+        return np.round(vector / scale).astype(np.int8), scale
+
+    def _hash(self, vector: np.ndarray) -> List[int]:
+        """Bucket key per table from the signs of the projections"""
+        if self._planes is None:
+            self._planes = self._rng.standard_normal(
+                (vector.shape[0], self.num_tables * self.num_bits)
+            ).astype(np.float32)
+
+        bits = (vector @ self._planes > 0).reshape(self.num_tables, self.num_bits)
+        return (bits @ self._powers).tolist()
@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import tempfile
 from pathlib import Path
 import logging
-from datetime import datetime
+import time
 
 from app.chatbot import ConstructionChatbot
 
@@ -14,6 +14,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Uploads are copied to disk 1 MB at a time instead of read whole
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # Initialize FastAPI
 app = FastAPI(
     title="Construction Document Assistant",
@@ -35,21 +38,22 @@ chatbot = ConstructionChatbot()
 @app.post("/documents/upload")
 async def upload_document(file: UploadFile = File(...)):
     """Upload and process a construction document"""
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     try:
-        # Save uploaded file safely
+        # Save uploaded file safely, streaming so large drawings
+        # never sit in memory all at once
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
             temp_path = Path(tmp_file.name)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                tmp_file.write(chunk)
         
         try:
             # Process the document
             result = await chatbot.process_document(temp_path)
             
             # Log processing time
-            processing_time = (datetime.now() - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             logger.info(
                 f"Processed {file.filename} in {processing_time:.2f}s - "
                 f"{result['sections_processed']} sections"
@@ -69,11 +73,11 @@ async def upload_document(file: UploadFile = File(...)):
 async def chat(message: str):
     """Chat with the construction document assistant"""
     try:
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         response = await chatbot.chat(message)
         
         # Log response time
-        processing_time = (datetime.now() - start_time).total_seconds()
+        processing_time = time.perf_counter() - start_time
         logger.info(f"Generated response in {processing_time:.2f}s")
         
         return response